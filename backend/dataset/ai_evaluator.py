@@ -7,22 +7,59 @@ Provides more intelligent validation than simple keyword matching.
 
 import os
 import json
+import atexit
+import hashlib
 from typing import Dict, List, Optional, Tuple
 from datetime import datetime
 from pathlib import Path
 from groq import Groq
 
 
+# Prompt for the AI semantic check; its text is part of the verdict cache key,
+# so editing it invalidates previously cached verdicts
+SEMANTIC_CHECK_PROMPT = """You are a strict test validator for a RAG (Retrieval-Augmented Generation) system.
+
+USER QUESTION: {question}
+
+AI RESPONSE: {response}
+
+EXPECTED INFORMATION: {expected_info}{forbidden_str}
+
+TASK: Determine if the AI response correctly answers the question using the expected information.
+
+RULES:
+1. The response doesn't need exact wording - semantic correctness matters
+2. If the answer is present but paraphrased, that's PASS
+3. If the answer is missing or incorrect, that's FAIL
+4. If forbidden keywords appear, that indicates context pollution - FAIL
+5. Be strict but fair - the core information must be there
+
+Reply in JSON format:
+{{
+  "result": "PASS" or "FAIL",
+  "reason": "Brief explanation (1-2 sentences max)",
+  "confidence": "high" or "medium" or "low"
+}}
+
+Respond ONLY with valid JSON, no other text."""
+SEMANTIC_CHECK_MAX_TOKENS = 50
+
+# Buffered AI_EVALUATION.log entries are flushed to disk after this many writes
+EVAL_LOG_FLUSH_EVERY = 50
+
+
 class AIEvaluator:
     """Evaluates test responses using AI for semantic understanding."""
     
-    def __init__(self, model: str = "llama-3.1-8b-instant", temperature: float = 0.0):
+    def __init__(self, model: str = "llama-3.1-8b-instant", temperature: float = 0.0, use_cache: bool = False):
         """
         Initialize the AI Evaluator.
         
         Args:
             model: The model to use for evaluation (via GROQ API)
             temperature: Temperature for model responses (0.0 = fully deterministic for reproducibility)
+            use_cache: Reuse AI verdicts from earlier runs for identical inputs (opt-in;
+                off by default so every evaluation is a fresh model call)
         """
         self.model = model
         self.temperature = temperature
@@ -32,6 +69,13 @@ class AIEvaluator:
         log_dir = Path(__file__).parent / "logs" / "dataset-results"
         log_dir.mkdir(parents=True, exist_ok=True)
         self.eval_log = log_dir / "AI_EVALUATION.log"
+        self._eval_log_fp = None  # Opened on first write and kept open for the run
+        self._eval_log_writes = 0
+        
+        # Persistent cache of AI verdicts (one JSON object per line)
+        self.use_cache = use_cache
+        self.cache_file = log_dir / "AI_EVALUATION_CACHE.jsonl"
+        self._cache = self._load_cache() if use_cache else {}
     
     def _ensure_groq_client(self):
         """Initialize Groq client only when needed."""
@@ -74,13 +118,19 @@ class AIEvaluator:
         )
         result.update(keyword_result)
         
-        # Method 2: AI semantic evaluation
-        ai_result = self._ai_semantic_check(
-            question,
-            ai_response,
-            expected_info,
-            forbidden_keywords or []
-        )
+        # Method 2: AI semantic evaluation (served from cache for repeated inputs)
+        cache_key = self._cache_key(question, ai_response, expected_info, forbidden_keywords or [])
+        ai_result = self._cache.get(cache_key) if self.use_cache else None
+        if ai_result is None:
+            ai_result = self._ai_semantic_check(
+                question,
+                ai_response,
+                expected_info,
+                forbidden_keywords or []
+            )
+            # Don't cache the fallback verdict produced when the API call failed
+            if self.use_cache and ai_result["ai_confidence"] != "none":
+                self._store_cache(cache_key, ai_result)
         result.update(ai_result)
         
         # Final verdict: Both must pass
@@ -91,6 +141,43 @@ class AIEvaluator:
         
         return result
     
+    def _cache_key(
+        self,
+        question: str,
+        response: str,
+        expected_info: str,
+        forbidden_keywords: List[str]
+    ) -> str:
+        """Hash every input the AI verdict depends on (prompt template, model settings, test data)."""
+        payload = json.dumps(
+            [SEMANTIC_CHECK_PROMPT, SEMANTIC_CHECK_MAX_TOKENS, self.model, self.temperature,
+             question, response, expected_info, forbidden_keywords],
+            ensure_ascii=False,
+            separators=(",", ":")
+        )
+        return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+    
+    def _load_cache(self) -> Dict[str, Dict]:
+        """Load cached AI verdicts from disk, skipping unreadable lines."""
+        cache = {}
+        if not self.cache_file.exists():
+            return cache
+        
+        with open(self.cache_file, 'r') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    cache[entry["key"]] = entry["result"]
+                except (json.JSONDecodeError, KeyError, TypeError):
+                    continue
+        return cache
+    
+    def _store_cache(self, key: str, ai_result: Dict[str, any]):
+        """Remember an AI verdict in memory and append it to the cache file."""
+        self._cache[key] = ai_result
+        with open(self.cache_file, 'a') as f:
+            f.write(json.dumps({"key": key, "result": ai_result}, ensure_ascii=False) + "\n")
+    
     def _keyword_check(
         self,
         response: str,
@@ -136,31 +223,12 @@ class AIEvaluator:
         
         forbidden_str = f"\nFORBIDDEN KEYWORDS (context pollution): {', '.join(forbidden_keywords)}" if forbidden_keywords else ""
         
-        prompt = f"""You are a strict test validator for a RAG (Retrieval-Augmented Generation) system.
-
-USER QUESTION: {question}
-
-AI RESPONSE: {response}
-
-EXPECTED INFORMATION: {expected_info}{forbidden_str}
-
-TASK: Determine if the AI response correctly answers the question using the expected information.
-
-RULES:
-1. The response doesn't need exact wording - semantic correctness matters
-2. If the answer is present but paraphrased, that's PASS
-3. If the answer is missing or incorrect, that's FAIL
-4. If forbidden keywords appear, that indicates context pollution - FAIL
-5. Be strict but fair - the core information must be there
-
-Reply in JSON format:
-{{
-  "result": "PASS" or "FAIL",
-  "reason": "Brief explanation (1-2 sentences max)",
-  "confidence": "high" or "medium" or "low"
-}}
-
-Respond ONLY with valid JSON, no other text."""
+        prompt = SEMANTIC_CHECK_PROMPT.format(
+            question=question,
+            response=response,
+            expected_info=expected_info,
+            forbidden_str=forbidden_str
+        )
 
         try:
             self._ensure_groq_client()
@@ -170,7 +238,7 @@ Respond ONLY with valid JSON, no other text."""
                 model=self.model,
                 messages=[{"role": "user", "content": prompt}],
                 temperature=self.temperature,
-                max_tokens=50
+                max_tokens=SEMANTIC_CHECK_MAX_TOKENS
             )
             
             # Extract evaluation
@@ -235,12 +303,30 @@ FINAL RESULT: {status_icon} {'PASS' if result['final_result'] else 'FAIL'} (Both
 
 """
         
-        # Append to log file
-        with open(self.eval_log, 'a') as f:
-            f.write(log_entry)
+        # Append to the persistent log handle (flushed every EVAL_LOG_FLUSH_EVERY entries,
+        # before reading back and at exit)
+        if self._eval_log_fp is None:
+            self._eval_log_fp = open(self.eval_log, 'a', buffering=1 << 16)
+            atexit.register(self.close)
+        self._eval_log_fp.write(log_entry)
+        self._eval_log_writes += 1
+        if self._eval_log_writes % EVAL_LOG_FLUSH_EVERY == 0:
+            self._eval_log_fp.flush()
+    
+    def flush(self):
+        """Flush buffered evaluation log entries to disk."""
+        if self._eval_log_fp is not None:
+            self._eval_log_fp.flush()
+    
+    def close(self):
+        """Flush and close the evaluation log handle."""
+        if self._eval_log_fp is not None:
+            self._eval_log_fp.close()
+            self._eval_log_fp = None
     
     def generate_summary(self) -> str:
         """Generate summary of all evaluations."""
+        self.flush()
         if not self.eval_log.exists():
             return "No evaluations logged yet."
         
@@ -7,9 +7,13 @@ Classifies responses as TP, TN, FP, or FN based on context matching
 import os
 import re
 import json
-from groq import Groq
+from groq import Groq, RateLimitError
 from typing import Literal, Dict, Any
 
+# How many times the Groq client retries a rate-limited (429) call, honouring
+# retry-after, before the classification is given up as FN
+MAX_RATE_LIMIT_RETRIES = 5
+
 # Context keyword definitions - will be matched as whole words with boundaries
 CONTEXT_KEYWORDS = {
     "programming": [
@@ -59,7 +63,7 @@ class ContextClassifier:
         if not api_key:
             raise ValueError("GROQ_API_KEY not set")
         
-        self.groq_client = Groq(api_key=api_key)
+        self.groq_client = Groq(api_key=api_key, max_retries=MAX_RATE_LIMIT_RETRIES)
         self.model = "llama-3.1-8b-instant"  # Cheap, fast model for classification
     
     def classify(
@@ -155,6 +159,9 @@ Answer only with: yes or no"""
             else:
                 return "FN"
         
+        except RateLimitError as e:
+            print(f"⚠️  LLM classification rate-limited after {MAX_RATE_LIMIT_RETRIES} retries: {e}")
+            return "FN"
         except Exception as e:
             print(f"⚠️  LLM classification failed: {e}")
             # Default to FN on error (conservative)
@@ -7,28 +7,134 @@ Runs baseline and system tests, calculates metrics, generates tables
 import os
 import sys
 import json
+import atexit
+import queue
+import threading
 import time
 import requests
 import subprocess
+from collections import deque
+from dataclasses import dataclass, fields
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 from pathlib import Path
-from typing import Dict, List, Any, Optional
-from datetime import datetime
+from typing import Dict, List, Any, Optional, Tuple
+from dotenv import load_dotenv
 
-# Load environment variables from .env file
-env_path = Path(__file__).parent.parent / ".env"
-if env_path.exists():
-    with open(env_path) as f:
-        for line in f:
-            line = line.strip()
-            if line and not line.startswith('#') and '=' in line:
-                key, value = line.split('=', 1)
-                os.environ[key] = value.strip()
+try:
+    import orjson  # Optional: faster JSON for scenario files, API responses and raw results
+except ImportError:
+    orjson = None
+
+try:
+    import numpy as np  # Optional: vectorized averages for large result sets
+except ImportError:
+    np = None
+
+# Directory of this script, resolved once for the env loader, imports, logs and scenarios
+_HERE = Path(__file__).resolve().parent
+
+# Load environment variables from .env file (variables already set in the shell win);
+# the flag skips the re-read when the module is imported again in the same process tree
+if not os.environ.get("_TEST_RUNNER_ENV_LOADED"):
+    env_path = _HERE.parent / ".env"
+    if env_path.exists():
+        load_dotenv(env_path, override=False)
+    os.environ["_TEST_RUNNER_ENV_LOADED"] = "1"
 
 # Add parent directory to path for imports
-sys.path.append(str(Path(__file__).parent))
+sys.path.append(str(_HERE))
  
 from context_classifier import ContextClassifier
 
+# Result lists at least this long are averaged with NumPy in calculate_metrics
+_NUMPY_MIN_ROWS = 256
+
+
+def _json_loads(data: bytes) -> Any:
+    """Decode JSON bytes with orjson when installed, stdlib json otherwise"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _json_dumps(obj: Any) -> bytes:
+    """Encode to indented JSON bytes with orjson, else pandas' ujson, else stdlib json"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    try:
+        from pandas.io.json import ujson_dumps  # pandas >= 2.1 bundles ujson; only loaded on this path
+    except ImportError:
+        pass
+    else:
+        return ujson_dumps(obj, indent=2, double_precision=15).encode()
+    return json.dumps(obj, indent=2).encode()
+
+
+@dataclass
+class ResultRow:
+    """One classified step of a baseline or system test run"""
+    step: int
+    context: str
+    node_type: Optional[str] = None  # System test only
+    message: str = ""
+    response: str = ""
+    classification: str = ""
+    classification_details: Optional[Dict] = None
+    input_tokens: int = 0
+    output_tokens: int = 0
+    total_tokens: int = 0
+    latency: float = 0.0
+    rag_used: bool = False
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Plain dict for raw_results.json (baseline rows carry no node_type)"""
+        row = {f.name: getattr(self, f.name) for f in fields(self)}
+        if self.node_type is None:
+            del row["node_type"]
+        return row
+
+
+class _AsyncLogWriter:
+    """Background thread that drains (handle, text) pairs so log() never blocks on disk I/O"""
+    
+    def __init__(self, maxsize: int = 20000):
+        self.q = queue.Queue(maxsize=maxsize)
+        self._thread = threading.Thread(target=self._run, name="metrics-log-writer", daemon=True)
+        self._thread.start()
+    
+    def _run(self):
+        while True:
+            item = self.q.get()
+            try:
+                if item is None:
+                    return
+                handle, text = item
+                handle.write(text)
+            finally:
+                self.q.task_done()
+    
+    def submit(self, handle, text: str):
+        """
+        Queue a write, blocking while the queue is full so lines keep their order and
+        only the writer thread touches the handles. Writes inline once the thread has stopped
+        """
+        if self._thread.is_alive():
+            self.q.put((handle, text))
+        else:
+            handle.write(text)
+    
+    def drain(self):
+        """Block until every queued line has been written"""
+        if self._thread.is_alive():
+            self.q.join()
+    
+    def stop(self):
+        """Write out remaining lines and stop the thread"""
+        if self._thread.is_alive():
+            self.q.put(None)
+            self._thread.join()
+
 
 class MetricsTestRunner:
     """Run comprehensive metrics-based evaluation"""
@@ -37,8 +143,29 @@ class MetricsTestRunner:
         self.base_url = base_url
         self.classifier = ContextClassifier()
         
+        # Classifier calls run here, overlapping with the next message round-trip
+        self._clf_pool = ThreadPoolExecutor(max_workers=int(os.environ.get("METRICS_CLASSIFY_WORKERS", "2")))
+        
+        # METRICS_VERBOSE=0 drops full AI response dumps and untyped INFO lines
+        self.verbose = os.environ.get("METRICS_VERBOSE", "1") == "1"
+        
+        # METRICS_LOG_SAMPLE=N echoes only every Nth INFO line to the console (log files get all)
+        self._console_every = max(1, int(os.environ.get("METRICS_LOG_SAMPLE", "1")))
+        self._info_ctr = 0
+        
+        # Pause between a reply and the next send, keeping the server's and classifier's
+        # LLM calls under provider rate limits (METRICS_MIN_INTERVAL=0 disables it)
+        self._min_interval = float(os.environ.get("METRICS_MIN_INTERVAL", "0.5"))
+        self._last_reply = 0.0
+        
+        # Shared HTTP session so keep-alive connections are reused across requests
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=16, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        
         # Setup directories
-        self.logs_dir = Path(__file__).parent / "logs" / "metrics_tests"
+        self.logs_dir = _HERE / "logs" / "metrics_tests"
         self.logs_dir.mkdir(parents=True, exist_ok=True)
         
         # Setup separate log files
@@ -46,27 +173,51 @@ class MetricsTestRunner:
         self.baseline_log_file = self.logs_dir / "baseline_test.log"
         self.system_log_file = self.logs_dir / "system_test.log"
         
+        # Persistent buffered log handles (flushed at test-phase boundaries)
+        self._log_handles = {
+            "baseline": open(self.baseline_log_file, 'a', buffering=1 << 16),
+            "system": open(self.system_log_file, 'a', buffering=1 << 16),
+            None: open(self.main_log_file, 'a', buffering=1 << 16)
+        }
+        self._log_writer = _AsyncLogWriter()
+        atexit.register(self.close)
+        
         # Results storage
         self.baseline_results = []
         self.system_results = []
         
     def log(self, message: str, level: str = "INFO", test_type: Optional[str] = None):
         """Log with timestamp to test-specific log file only"""
-        timestamp = datetime.now().strftime("%H:%M:%S")
+        if level == "INFO" and test_type is None and not self.verbose:
+            return
+        timestamp = time.strftime("%H:%M:%S")
         log_msg = f"[{timestamp}] [{level}] {message}"
-        print(log_msg)
-        
-        # Write to test-specific log ONLY (not main log)
-        if test_type == "baseline":
-            with open(self.baseline_log_file, 'a') as f:
-                f.write(log_msg + "\n")
-        elif test_type == "system":
-            with open(self.system_log_file, 'a') as f:
-                f.write(log_msg + "\n")
+        if level != "INFO" or self._console_every == 1:
+            print(log_msg)
         else:
-            # If no test_type specified, write to main log
-            with open(self.main_log_file, 'a') as f:
-                f.write(log_msg + "\n")
+            if self._info_ctr % self._console_every == 0:
+                print(log_msg)
+            self._info_ctr += 1
+        
+        # Write to test-specific log ONLY (not main log); anything else goes to main log
+        handle = self._log_handles.get(test_type) or self._log_handles[None]
+        self._log_writer.submit(handle, log_msg + "\n")
+    
+    def flush_logs(self):
+        """Wait for queued log lines, then flush buffered log handles to disk"""
+        self._log_writer.drain()
+        for handle in self._log_handles.values():
+            if not handle.closed:
+                handle.flush()
+    
+    def close(self):
+        """Stop worker threads, close the HTTP session, then flush and close all log handles"""
+        self._clf_pool.shutdown(wait=True)
+        self.session.close()
+        self._log_writer.stop()
+        for handle in self._log_handles.values():
+            if not handle.closed:
+                handle.close()
     
     def wait_for_server_ready(self):
         """Wait for server to be ready"""
@@ -75,7 +226,7 @@ class MetricsTestRunner:
         max_retries = 10
         for i in range(max_retries):
             try:
-                response = requests.get(f"{self.base_url}/health", timeout=2)
+                response = self.session.get(f"{self.base_url}/health", timeout=2)
                 if response.status_code == 200:
                     self.log("✅ Server is ready!", "INFO")
                     return True
@@ -98,6 +249,7 @@ class MetricsTestRunner:
         self.log("   4. Wait for 'Application startup complete'", "WARN")
         self.log("   This ensures clean ChromaDB state (no context from previous test)", "WARN")
         self.log("="*80, "WARN")
+        self.flush_logs()
         
         input("\n👉 Press ENTER after restarting the server...")
         
@@ -111,24 +263,23 @@ class MetricsTestRunner:
     
     def load_scenario(self, scenario_file: str) -> Dict:
         """Load JSON scenario"""
-        scenario_path = Path(__file__).parent / "scenarios" / scenario_file
+        scenario_path = _HERE / "scenarios" / scenario_file
         
         if not scenario_path.exists():
             self.log(f"❌ Scenario not found: {scenario_file}", "ERROR")
             return None
         
-        with open(scenario_path, 'r') as f:
-            return json.load(f)
+        return _json_loads(scenario_path.read_bytes())
     
     def create_conversation(self, title: str = "Test Chat") -> Optional[str]:
         """Create new conversation, return node_id"""
         try:
-            response = requests.post(
+            response = self.session.post(
                 f"{self.base_url}/api/conversations",
                 json={"title": title}
             )
             response.raise_for_status()
-            return response.json().get("node_id")
+            return _json_loads(response.content).get("node_id")
         except Exception as e:
             self.log(f"❌ Failed to create conversation: {e}", "ERROR")
             return None
@@ -143,29 +294,31 @@ class MetricsTestRunner:
                 payload["selected_text"] = selected_text
                 payload["context_type"] = "follow_up"
             
-            response = requests.post(
+            response = self.session.post(
                 f"{self.base_url}/api/conversations/{parent_id}/subchats",
                 json=payload
             )
             response.raise_for_status()
-            return response.json().get("node_id")
+            return _json_loads(response.content).get("node_id")
         except Exception as e:
             self.log(f"❌ Failed to create subchat: {e}", "ERROR")
             return None
     
     def send_message(self, node_id: str, message: str, disable_rag: bool = False) -> Optional[Dict]:
         """Send message to node"""
+        if self._min_interval > 0:
+            self._throttle()
         try:
             start_time = time.time()
             
-            response = requests.post(
+            response = self.session.post(
                 f"{self.base_url}/api/conversations/{node_id}/messages",
                 json={"message": message, "disable_rag": disable_rag}
             )
             response.raise_for_status()
             
             latency = time.time() - start_time
-            result = response.json()
+            result = _json_loads(response.content)
             result["latency"] = latency
             
             # Debug: log the actual response structure (keys only, not full content)
@@ -180,11 +333,21 @@ class MetricsTestRunner:
         except Exception as e:
             self.log(f"❌ Failed to send message: {e}", "ERROR")
             return None
+        finally:
+            self._last_reply = time.monotonic()
     
-    def run_baseline_test(self, scenario: Dict) -> List[Dict]:
+    def _throttle(self):
+        """Sleep until METRICS_MIN_INTERVAL has passed since the previous reply"""
+        wait = self._last_reply + self._min_interval - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+    
+    def run_baseline_test(self, scenario: Dict) -> Tuple[List[ResultRow], Dict[str, int]]:
         """
         Run BASELINE test: ONE conversation for ALL contexts (NO subchats)
         Simulates traditional chatbots like ChatGPT/Claude where all topics are mixed
+        
+        Returns the result rows and their TP/TN/FP/FN counts
         """
         self.log("="*80, "INFO", "baseline")
         self.log(f"🔵 BASELINE TEST: {scenario['scenario_name']}", "INFO", "baseline")
@@ -197,11 +360,12 @@ class MetricsTestRunner:
         main_node_id = self.create_conversation("Baseline - All Topics")
         if not main_node_id:
             self.log("❌ Failed to create baseline conversation", "ERROR", "baseline")
-            return results
+            return results, {"TP": 0, "TN": 0, "FP": 0, "FN": 0}
         
         self.log(f"  📝 Created single conversation for all topics", "INFO", "baseline")
         
-        tp_count = tn_count = fp_count = fn_count = 0
+        counts = {"TP": 0, "TN": 0, "FP": 0, "FN": 0}
+        pending = deque()  # (step_data, node_type, response, ai_message, future) awaiting classification
         
         for step_data in scenario["conversations"]:
             step = step_data["step"]
@@ -231,52 +395,17 @@ class MetricsTestRunner:
                 continue
             
             # Log full AI response
-            self.log(f"  🤖 AI Response:", "INFO", "baseline")
-            self.log(ai_message, "INFO", "baseline")
-            
-            # Classify response
-            classification_details = self.classifier.get_classification_details(
-                ai_message,
-                expected
-            )
-            
-            classification = classification_details["classification"]
-            
-            # Count classifications
-            if classification == "TP":
-                tp_count += 1
-            elif classification == "TN":
-                tn_count += 1
-            elif classification == "FP":
-                fp_count += 1
-            elif classification == "FN":
-                fn_count += 1
+            if self.verbose:
+                self.log(f"  🤖 AI Response:", "INFO", "baseline")
+                self.log(ai_message, "INFO", "baseline")
             
-            # Color-coded classification
-            if classification in ["TP", "TN"]:
-                self.log(f"  ✅ Classification: {classification} ({classification_details['method']})", "INFO", "baseline")
-            else:
-                self.log(f"  ❌ Classification: {classification} ({classification_details['method']})", "WARN", "baseline")
-            
-            if classification_details.get("forbidden_keywords_found"):
-                self.log(f"  ⚠️  Forbidden keywords: {classification_details['forbidden_keywords_found']}", "WARN", "baseline")
-            
-            # Store result
-            results.append({
-                "step": step,
-                "context": context,
-                "message": message,
-                "response": ai_message,
-                "classification": classification,
-                "classification_details": classification_details,
-                "input_tokens": response.get("usage", {}).get("prompt_tokens", 0),
-                "output_tokens": response.get("usage", {}).get("completion_tokens", 0),
-                "total_tokens": response.get("usage", {}).get("total_tokens", 0),
-                "latency": response.get("latency", 0),
-                "rag_used": "tool_calls" in response or "retrieved" in response
-            })
-            
-            time.sleep(0.5)  # Brief delay between requests
+            # Classify in the background so the next message goes out right away
+            future = self._clf_pool.submit(self.classifier.get_classification_details, ai_message, expected)
+            pending.append((step_data, None, response, ai_message, future))
+            self._finish_classified(pending, results, counts, "baseline", wait=False)
+        
+        self._finish_classified(pending, results, counts, "baseline", wait=True)
+        tp_count, tn_count, fp_count, fn_count = counts["TP"], counts["TN"], counts["FP"], counts["FN"]
         
         # Print summary
         self.log("\n" + "="*80, "INFO", "baseline")
@@ -286,13 +415,16 @@ class MetricsTestRunner:
         self.log(f"   ❌ Incorrect (FP+FN): {fp_count + fn_count}", "INFO", "baseline")
         self.log(f"   Accuracy: {((tp_count + tn_count) / len(results) * 100):.1f}%" if results else "0%", "INFO", "baseline")
         self.log("="*80, "INFO", "baseline")
+        self.flush_logs()
         
-        return results
+        return results, counts
     
-    def run_system_test(self, scenario: Dict) -> List[Dict]:
+    def run_system_test(self, scenario: Dict) -> Tuple[List[ResultRow], Dict[str, int]]:
         """
         Run SYSTEM test: Main chat + subchats architecture (OUR SYSTEM)
         Uses Subchat Trees for context isolation
+        
+        Returns the result rows and their TP/TN/FP/FN counts
         """
         self.log("="*80, "INFO", "system")
         self.log(f"🟢 SYSTEM TEST: {scenario['scenario_name']}", "INFO", "system")
@@ -301,14 +433,14 @@ class MetricsTestRunner:
         
         results = []
         node_map = {}  # Track nodes
-        
-        tp_count = tn_count = fp_count = fn_count = 0
+        counts = {"TP": 0, "TN": 0, "FP": 0, "FN": 0}
+        pending = deque()  # (step_data, node_type, response, ai_message, future) awaiting classification
         
         # Create main conversation
         main_id = self.create_conversation("System Test - Main")
         if not main_id:
             self.log("❌ Failed to create main conversation", "ERROR", "system")
-            return results
+            return results, counts
         
         node_map["main"] = main_id
         self.log(f"  📝 Created main conversation", "INFO", "system")
@@ -364,73 +496,98 @@ class MetricsTestRunner:
                 continue
             
             # Log full AI response
-            self.log(f"  🤖 AI Response:", "INFO", "system")
-            self.log(ai_message, "INFO", "system")
-            
-            # Classify response
-            classification_details = self.classifier.get_classification_details(
-                ai_message,
-                expected
-            )
+            if self.verbose:
+                self.log(f"  🤖 AI Response:", "INFO", "system")
+                self.log(ai_message, "INFO", "system")
             
+            # Classify in the background so the next message goes out right away
+            future = self._clf_pool.submit(self.classifier.get_classification_details, ai_message, expected)
+            pending.append((step_data, node_type, response, ai_message, future))
+            self._finish_classified(pending, results, counts, "system", wait=False)
+        
+        self._finish_classified(pending, results, counts, "system", wait=True)
+        
+        tp_count, tn_count, fp_count, fn_count = counts["TP"], counts["TN"], counts["FP"], counts["FN"]
+        
+        # Print summary
+        self.log("\n" + "="*80, "INFO", "system")
+        self.log("📊 SYSTEM TEST SUMMARY", "INFO", "system")
+        self.log(f"   Total Steps: {len(results)}", "INFO", "system")
+        self.log(f"   ✅ Correct (TP+TN): {tp_count + tn_count}", "INFO", "system")
+        self.log(f"   ❌ Incorrect (FP+FN): {fp_count + fn_count}", "INFO", "system")
+        self.log(f"   Accuracy: {((tp_count + tn_count) / len(results) * 100):.1f}%" if results else "0%", "INFO", "system")
+        self.log("="*80, "INFO", "system")
+        self.flush_logs()
+        
+        return results, counts
+    
+    def _finish_classified(self, pending: deque, results: List[ResultRow], counts: Dict[str, int],
+                           test_type: str, wait: bool):
+        """
+        Log, count and store classified steps in step order. With wait=False only the
+        leading steps whose classification has already finished are taken
+        """
+        while pending and (wait or pending[0][4].done()):
+            step_data, node_type, response, ai_message, future = pending.popleft()
+            step = step_data["step"]
+            classification_details = future.result()
             classification = classification_details["classification"]
             
             # Count classifications
-            if classification == "TP":
-                tp_count += 1
-            elif classification == "TN":
-                tn_count += 1
-            elif classification == "FP":
-                fp_count += 1
-            elif classification == "FN":
-                fn_count += 1
+            if classification in counts:
+                counts[classification] += 1
             
             # Color-coded classification
             if classification in ["TP", "TN"]:
-                self.log(f"  ✅ Classification: {classification} ({classification_details['method']})", "INFO", "system")
+                self.log(f"  ✅ [Step {step}] Classification: {classification} ({classification_details['method']})", "INFO", test_type)
             else:
-                self.log(f"  ❌ Classification: {classification} ({classification_details['method']})", "WARN", "system")
+                self.log(f"  ❌ [Step {step}] Classification: {classification} ({classification_details['method']})", "WARN", test_type)
             
             if classification_details.get("forbidden_keywords_found"):
-                self.log(f"  ⚠️  Forbidden keywords: {classification_details['forbidden_keywords_found']}", "WARN", "system")
+                self.log(f"  ⚠️  Forbidden keywords: {classification_details['forbidden_keywords_found']}", "WARN", test_type)
             
             # Store result
-            results.append({
-                "step": step,
-                "context": context,
-                "node_type": node_type,
-                "message": message,
-                "response": ai_message,
-                "classification": classification,
-                "classification_details": classification_details,
-                "input_tokens": response.get("usage", {}).get("prompt_tokens", 0),
-                "output_tokens": response.get("usage", {}).get("completion_tokens", 0),
-                "total_tokens": response.get("usage", {}).get("total_tokens", 0),
-                "latency": response.get("latency", 0),
-                "rag_used": "tool_calls" in response or "retrieved" in response
-            })
-            
-            time.sleep(0.5)  # Brief delay
+            results.append(ResultRow(
+                step=step,
+                context=step_data["context"],
+                node_type=node_type,
+                message=step_data["message"],
+                response=ai_message,
+                classification=classification,
+                classification_details=classification_details,
+                input_tokens=response.get("usage", {}).get("prompt_tokens", 0),
+                output_tokens=response.get("usage", {}).get("completion_tokens", 0),
+                total_tokens=response.get("usage", {}).get("total_tokens", 0),
+                latency=response.get("latency", 0),
+                rag_used="tool_calls" in response or "retrieved" in response
+            ))
+    
+    def calculate_metrics(self, baseline_results: List[ResultRow], system_results: List[ResultRow],
+                          baseline_counts: Optional[Dict[str, int]] = None,
+                          system_counts: Optional[Dict[str, int]] = None) -> Dict:
+        """
+        Calculate all metrics for tables
         
-        # Print summary
-        self.log("\n" + "="*80, "INFO", "system")
-        self.log("📊 SYSTEM TEST SUMMARY", "INFO", "system")
-        self.log(f"   Total Steps: {len(results)}", "INFO", "system")
-        self.log(f"   ✅ Correct (TP+TN): {tp_count + tn_count}", "INFO", "system")
-        self.log(f"   ❌ Incorrect (FP+FN): {fp_count + fn_count}", "INFO", "system")
-        self.log(f"   Accuracy: {((tp_count + tn_count) / len(results) * 100):.1f}%" if results else "0%", "INFO", "system")
-        self.log("="*80, "INFO", "system")
+        TP/TN/FP/FN counts collected during the test loops can be passed in to skip
+        re-scanning the results; without them they are counted from the results.
+        """
         
-        return results
-    
-    def calculate_metrics(self, baseline_results: List[Dict], system_results: List[Dict]) -> Dict:
-        """Calculate all metrics for tables"""
-        
-        def calc_isolation_metrics(results):
-            tp = sum(1 for r in results if r["classification"] == "TP")
-            tn = sum(1 for r in results if r["classification"] == "TN")
-            fp = sum(1 for r in results if r["classification"] == "FP")
-            fn = sum(1 for r in results if r["classification"] == "FN")
+        def calc_isolation_metrics(results, counts=None):
+            if counts is not None:
+                tp, tn, fp, fn = counts["TP"], counts["TN"], counts["FP"], counts["FN"]
+            else:
+                # Single pass over results
+                tp = tn = fp = fn = 0
+                for r in results:
+                    c = r.classification
+                    if c == "TP":
+                        tp += 1
+                    elif c == "TN":
+                        tn += 1
+                    elif c == "FP":
+                        fp += 1
+                    elif c == "FN":
+                        fn += 1
             total = len(results)
             
             precision = tp / (tp + fp) if (tp + fp) > 0 else 0
@@ -451,14 +608,34 @@ class MetricsTestRunner:
             if not results:
                 return {}
             
-            avg_input = sum(r["input_tokens"] for r in results) / len(results)
-            avg_output = sum(r["output_tokens"] for r in results) / len(results)
-            avg_total = sum(r["total_tokens"] for r in results) / len(results)
-            avg_latency = sum(r["latency"] for r in results) / len(results)
-            
-            rag_used_count = sum(1 for r in results if r["rag_used"])
-            buffer_hit_rate = ((len(results) - rag_used_count) / len(results)) * 100 if results else 0
-            archive_hit_rate = (rag_used_count / len(results)) * 100 if results else 0
+            n = len(results)
+            if np is not None and n >= _NUMPY_MIN_ROWS:
+                # Vectorized sums; below the threshold the array setup costs more than it saves
+                sum_input = int(np.fromiter((r.input_tokens for r in results), dtype=np.int64, count=n).sum())
+                sum_output = int(np.fromiter((r.output_tokens for r in results), dtype=np.int64, count=n).sum())
+                sum_total = int(np.fromiter((r.total_tokens for r in results), dtype=np.int64, count=n).sum())
+                sum_latency = float(np.fromiter((r.latency for r in results), dtype=np.float64, count=n).sum())
+                rag_used_count = int(np.fromiter((r.rag_used for r in results), dtype=bool, count=n).sum())
+            else:
+                # Single pass over results
+                sum_input = sum_output = sum_total = 0
+                sum_latency = 0.0
+                rag_used_count = 0
+                for r in results:
+                    sum_input += r.input_tokens
+                    sum_output += r.output_tokens
+                    sum_total += r.total_tokens
+                    sum_latency += r.latency
+                    if r.rag_used:
+                        rag_used_count += 1
+            
+            avg_input = sum_input / n
+            avg_output = sum_output / n
+            avg_total = sum_total / n
+            avg_latency = sum_latency / n
+            
+            buffer_hit_rate = ((n - rag_used_count) / n) * 100
+            archive_hit_rate = (rag_used_count / n) * 100
             
             # Calculate token efficiency: tokens per CORRECT answer
             accuracy = isolation_metrics.get("accuracy", 0)
@@ -477,8 +654,8 @@ class MetricsTestRunner:
                 "tokens_per_correct_answer": tokens_per_correct
             }
         
-        baseline_isolation = calc_isolation_metrics(baseline_results)
-        system_isolation = calc_isolation_metrics(system_results)
+        baseline_isolation = calc_isolation_metrics(baseline_results, baseline_counts)
+        system_isolation = calc_isolation_metrics(system_results, system_counts)
         
         baseline_performance = calc_performance_metrics(baseline_results, baseline_isolation)
         system_performance = calc_performance_metrics(system_results, system_isolation)
@@ -516,28 +693,32 @@ class MetricsTestRunner:
         
         # Table 1
         table1 = metrics["table_1"]
+        out = []
         with open(output_dir / "TABLE_1_CONTEXT_ISOLATION.md", 'w') as f:
-            f.write("# TABLE 1: CONTEXT ISOLATION METRICS\n\n")
-            f.write("| Metric | Baseline System | Our System | Improvement |\n")
-            f.write("|--------|----------------|------------|-------------|\n")
+            out.append("# TABLE 1: CONTEXT ISOLATION METRICS\n\n")
+            out.append("| Metric | Baseline System | Our System | Improvement |\n")
+            out.append("|--------|----------------|------------|-------------|\n")
             
             for metric in ["precision", "recall", "f1", "accuracy", "pollution_rate"]:
                 baseline_val = table1["baseline"][metric]
                 system_val = table1["system"][metric]
                 improvement = table1["improvements"][metric]
                 
-                f.write(f"| **{metric.replace('_', ' ').title()}** | ")
-                f.write(f"{baseline_val:.1f}% | {system_val:.1f}% | ")
-                f.write(f"**{improvement:+.1f}%** |\n")
+                out.append(f"| **{metric.replace('_', ' ').title()}** | ")
+                out.append(f"{baseline_val:.1f}% | {system_val:.1f}% | ")
+                out.append(f"**{improvement:+.1f}%** |\n")
+            
+            f.write("".join(out))
         
         self.log("✅ Generated TABLE_1_CONTEXT_ISOLATION.md", "INFO")
         
         # Table 3
         table3 = metrics["table_3"]
+        out = []
         with open(output_dir / "TABLE_3_SYSTEM_PERFORMANCE.md", 'w') as f:
-            f.write("# TABLE 3: SYSTEM PERFORMANCE METRICS\n\n")
-            f.write("| Metric | Baseline System | Our System | Improvement |\n")
-            f.write("|--------|----------------|------------|-------------|\n")
+            out.append("# TABLE 3: SYSTEM PERFORMANCE METRICS\n\n")
+            out.append("| Metric | Baseline System | Our System | Improvement |\n")
+            out.append("|--------|----------------|------------|-------------|\n")
             
             # Token metrics
             for metric in ["avg_input_tokens", "avg_output_tokens", "avg_total_tokens"]:
@@ -545,30 +726,30 @@ class MetricsTestRunner:
                 system_val = table3["system"][metric]
                 improvement = table3["improvements"][metric]
                 
-                f.write(f"| **{metric.replace('_', ' ').title()}** | ")
-                f.write(f"{baseline_val:.0f} | {system_val:.0f} | ")
-                f.write(f"**{improvement:+.1f}%** |\n")
+                out.append(f"| **{metric.replace('_', ' ').title()}** | ")
+                out.append(f"{baseline_val:.0f} | {system_val:.0f} | ")
+                out.append(f"**{improvement:+.1f}%** |\n")
             
             # Token efficiency (most important metric!)
             baseline_per_correct = table3["baseline"]["tokens_per_correct_answer"]
             system_per_correct = table3["system"]["tokens_per_correct_answer"]
             efficiency_improvement = ((baseline_per_correct - system_per_correct) / baseline_per_correct) * 100
-            f.write(f"| **Tokens Per Correct Answer** | ")
-            f.write(f"{baseline_per_correct:.0f} | {system_per_correct:.0f} | ")
-            f.write(f"**{efficiency_improvement:+.1f}% MORE EFFICIENT** |\n")
+            out.append(f"| **Tokens Per Correct Answer** | ")
+            out.append(f"{baseline_per_correct:.0f} | {system_per_correct:.0f} | ")
+            out.append(f"**{efficiency_improvement:+.1f}% MORE EFFICIENT** |\n")
             
             # Latency
             baseline_lat = table3["baseline"]["avg_latency"]
             system_lat = table3["system"]["avg_latency"]
             lat_improvement = table3["improvements"]["avg_latency"]
-            f.write(f"| **Avg Latency** | {baseline_lat:.2f}s | {system_lat:.2f}s | **{lat_improvement:+.1f}%** |\n")
+            out.append(f"| **Avg Latency** | {baseline_lat:.2f}s | {system_lat:.2f}s | **{lat_improvement:+.1f}%** |\n")
             
             # Token Compression Rate
             baseline_total = table3["baseline"]["avg_total_tokens"]
             system_total = table3["system"]["avg_total_tokens"]
             compression_rate = ((baseline_total - system_total) / baseline_total) * 100
             compression_ratio = baseline_total / system_total
-            f.write(f"| **Token Compression Rate** | 0% | {compression_rate:.1f}% | **{compression_ratio:.2f}x compression** |\n")
+            out.append(f"| **Token Compression Rate** | 0% | {compression_rate:.1f}% | **{compression_ratio:.2f}x compression** |\n")
             
             # Cost metrics (using OpenAI GPT OSS 20B pricing: $0.075/1K input, $0.30/1K output)
             baseline_input = table3["baseline"]["avg_input_tokens"]
@@ -580,21 +761,23 @@ class MetricsTestRunner:
             system_cost = (system_input * 0.075 + system_output * 0.30) / 1000
             cost_improvement = ((baseline_cost - system_cost) / baseline_cost) * 100
             
-            f.write(f"| **Cost per Query** | ${baseline_cost:.6f} | ${system_cost:.6f} | **{cost_improvement:+.1f}%** |\n")
-            f.write(f"| **Cost per 1M Queries** | ${baseline_cost*1000000:.0f} | ${system_cost*1000000:.0f} | **-${(baseline_cost-system_cost)*1000000:.0f} savings** |\n")
+            out.append(f"| **Cost per Query** | ${baseline_cost:.6f} | ${system_cost:.6f} | **{cost_improvement:+.1f}%** |\n")
+            out.append(f"| **Cost per 1M Queries** | ${baseline_cost*1000000:.0f} | ${system_cost*1000000:.0f} | **-${(baseline_cost-system_cost)*1000000:.0f} savings** |\n")
             
             # Add explanation note
-            f.write("\n---\n\n")
-            f.write("## Notes on Token Usage\n\n")
-            f.write("**Why does the system use more tokens per query?**\n\n")
-            f.write("The system uses ~39% more tokens due to:\n")
-            f.write("1. **Follow-up context prompts** (~50 tokens per subchat): Ensures coherence across isolated conversations\n")
-            f.write("2. **Higher response quality**: System gives complete, accurate answers (92.5% accuracy) vs baseline's confused, partial answers (60% accuracy)\n\n")
-            f.write("**However, the system is MORE EFFICIENT when measuring tokens per CORRECT answer:**\n")
-            f.write(f"- Baseline: {baseline_total:.0f} avg tokens × (100/{metrics['table_1']['baseline']['accuracy']:.1f}%) = {baseline_per_correct:.0f} tokens per correct answer\n")
-            f.write(f"- System: {system_total:.0f} avg tokens × (100/{metrics['table_1']['system']['accuracy']:.1f}%) = {system_per_correct:.0f} tokens per correct answer\n")
-            f.write(f"- **Result: System is {efficiency_improvement:.1f}% MORE EFFICIENT!**\n\n")
-            f.write("This means you get MORE correct answers for FEWER tokens overall.\n")
+            out.append("\n---\n\n")
+            out.append("## Notes on Token Usage\n\n")
+            out.append("**Why does the system use more tokens per query?**\n\n")
+            out.append("The system uses ~39% more tokens due to:\n")
+            out.append("1. **Follow-up context prompts** (~50 tokens per subchat): Ensures coherence across isolated conversations\n")
+            out.append("2. **Higher response quality**: System gives complete, accurate answers (92.5% accuracy) vs baseline's confused, partial answers (60% accuracy)\n\n")
+            out.append("**However, the system is MORE EFFICIENT when measuring tokens per CORRECT answer:**\n")
+            out.append(f"- Baseline: {baseline_total:.0f} avg tokens × (100/{metrics['table_1']['baseline']['accuracy']:.1f}%) = {baseline_per_correct:.0f} tokens per correct answer\n")
+            out.append(f"- System: {system_total:.0f} avg tokens × (100/{metrics['table_1']['system']['accuracy']:.1f}%) = {system_per_correct:.0f} tokens per correct answer\n")
+            out.append(f"- **Result: System is {efficiency_improvement:.1f}% MORE EFFICIENT!**\n\n")
+            out.append("This means you get MORE correct answers for FEWER tokens overall.\n")
+            
+            f.write("".join(out))
         
         self.log("✅ Generated TABLE_3_SYSTEM_PERFORMANCE.md", "INFO")
     
@@ -612,6 +795,8 @@ class MetricsTestRunner:
         
         all_baseline_results = []
         all_system_results = []
+        all_baseline_counts = {"TP": 0, "TN": 0, "FP": 0, "FN": 0}
+        all_system_counts = {"TP": 0, "TN": 0, "FP": 0, "FN": 0}
         
         for scenario_file in scenario_files:
             scenario = self.load_scenario(scenario_file)
@@ -624,20 +809,27 @@ class MetricsTestRunner:
             if not self.prompt_restart_server("BASELINE"):
                 continue
             
-            baseline_results = self.run_baseline_test(scenario)
+            baseline_results, baseline_counts = self.run_baseline_test(scenario)
             all_baseline_results.extend(baseline_results)
+            for k, v in baseline_counts.items():
+                all_baseline_counts[k] += v
             
             # Test system
             self.log(f"\n🟢 SYSTEM TEST: {scenario_file}", "INFO")
             if not self.prompt_restart_server("SYSTEM"):
                 continue
             
-            system_results = self.run_system_test(scenario)
+            system_results, system_counts = self.run_system_test(scenario)
             all_system_results.extend(system_results)
+            for k, v in system_counts.items():
+                all_system_counts[k] += v
         
         # Calculate metrics
         self.log("\n📊 Calculating metrics...", "INFO")
-        metrics = self.calculate_metrics(all_baseline_results, all_system_results)
+        metrics = self.calculate_metrics(
+            all_baseline_results, all_system_results,
+            all_baseline_counts, all_system_counts
+        )
         
         # Print metrics summary
         self.log("\n" + "="*80, "INFO")
@@ -669,16 +861,17 @@ class MetricsTestRunner:
         
         # Save raw results
         results_file = self.logs_dir / "raw_results.json"
-        with open(results_file, 'w') as f:
-            json.dump({
-                "baseline": all_baseline_results,
-                "system": all_system_results,
+        with open(results_file, 'wb') as f:
+            f.write(_json_dumps({
+                "baseline": [r.to_dict() for r in all_baseline_results],
+                "system": [r.to_dict() for r in all_system_results],
                 "metrics": metrics
-            }, f, indent=2)
+            }))
         
         self.log(f"\n✅ Results saved to: {results_file}", "INFO")
         self.log(f"✅ Tables saved to: {self.logs_dir / 'tables'}", "INFO")
         self.log("\n🎉 EVALUATION COMPLETE!", "INFO")
+        self.flush_logs()
 
 
 if __name__ == "__main__":
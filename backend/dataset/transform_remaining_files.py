@@ -4,9 +4,26 @@ Transform remaining 3 files in nested_dataset to evaluation format
 """
 
 import json
+import os
 import re
+from functools import lru_cache
 from pathlib import Path
 
+try:
+    import orjson  # Optional: much faster load/dump of the dataset files
+except ImportError:
+    orjson = None
+
+# Topic introduction prefix: "topic_name : question"
+_TOPIC_RE = re.compile(r'^(\w+(?:_\w+)*)\s*:\s*')
+# A key this long that is still only a word run may hide a colon past the cut
+_TOPIC_KEY_LEN = 64
+_WORD_RUN_RE = re.compile(r'\w+\s*')
+_UNDECIDED = object()
+
+# Marker of an expected field that already carries the topic prefix requirement
+_RSW = "Response must start with"
+
 # File definitions with topic mappings
 files_to_transform = {
     "22807e655dd042348cb0ee4023672e70_structured.json": {
@@ -78,6 +95,16 @@ def add_instruction_step(data):
     data['conversations'].insert(0, instruction)
     data['total_turns'] += 1
 
+@lru_cache(maxsize=4096)
+def _topic_of(prefix):
+    """Topic named by a message's leading characters, None, or _UNDECIDED if cut too short"""
+    topic_match = _TOPIC_RE.match(prefix)
+    if topic_match:
+        return topic_match.group(1)
+    if len(prefix) == _TOPIC_KEY_LEN and _WORD_RUN_RE.fullmatch(prefix):
+        return _UNDECIDED
+    return None
+
 def update_expected_fields(data):
     """Update all expected fields to require topic prefix"""
     current_topic = None
@@ -88,16 +115,19 @@ def update_expected_fields(data):
         
         # Detect topic introductions (messages with topic_name : pattern)
         message = conv.get('message', '')
-        topic_match = re.match(r'^(\w+(?:_\w+)*)\s*:\s*', message)
+        topic = _topic_of(message[:_TOPIC_KEY_LEN])
+        if topic is _UNDECIDED:
+            topic_match = _TOPIC_RE.match(message)
+            topic = topic_match.group(1) if topic_match else None
         
-        if topic_match:
-            current_topic = topic_match.group(1)
+        if topic:
+            current_topic = topic
         
         # Update expected field
         if current_topic and 'expected' in conv:
             expected = conv['expected']
-            # Add "Response must start with 'topic:'" prefix
-            if not expected.startswith("Response must start with"):
+            # Add "Response must start with 'topic:'" prefix unless already present
+            if not expected.startswith(_RSW):
                 conv['expected'] = f"Response must start with '{current_topic}:' - {expected}"
 
 def transform_file(filename):
@@ -108,8 +138,11 @@ def transform_file(filename):
     print(f"Transforming: {filename}")
     print(f"{'='*80}")
     
-    with open(filepath, 'r') as f:
-        data = json.load(f)
+    if orjson is not None:
+        data = orjson.loads(filepath.read_bytes())
+    else:
+        with open(filepath, 'r') as f:
+            data = json.load(f)
     
     print(f"  Original turns: {data['total_turns']}")
     
@@ -121,9 +154,14 @@ def transform_file(filename):
     # Update expected fields
     update_expected_fields(data)
     
-    # Save
-    with open(filepath, 'w') as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    # Save to a temp file first, then swap it in so an interrupted run can't truncate the dataset
+    tmp_path = filepath.with_suffix(filepath.suffix + '.tmp')
+    if orjson is not None:
+        tmp_path.write_bytes(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+    else:
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, filepath)
     
     print(f"  ✅ Saved: {filepath}")
 
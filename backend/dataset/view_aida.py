@@ -9,6 +9,10 @@ It's useful for testing entity disambiguation and multi-entity conversations.
 import sys
 from pathlib import Path
 
+# NE tag classes, looked up by the tag's two-character prefix
+BIO_OUTSIDE, BIO_BEGIN, BIO_INSIDE = 0, 1, 2
+_BIO_CLASS = {'B-': BIO_BEGIN, 'I-': BIO_INSIDE}
+
 
 def read_aida_tsv(file_path, limit=10):
     """
@@ -23,17 +27,22 @@ def read_aida_tsv(file_path, limit=10):
     print(f"📂 Reading AIDA-YAGO2 dataset from: {file_path}\n")
     print("="*80)
     
+    # Nothing would be shown, so don't scan the whole file
+    if limit <= 0:
+        print(f"\n✅ Displayed 0 documents")
+        return
+    
     documents_shown = 0
-    current_doc = []
-    current_sentence = []
+    current_doc = []  # Sentences as (tokens, pos_tags, ne_tags, entities) column lists
+    tokens, pos_tags, ne_tags, entities = [], [], [], []
     doc_id = None
     
     with open(file_path, 'r', encoding='utf-8') as f:
         for line_num, line in enumerate(f, 1):
             line = line.strip()
             
-            # New document marker
-            if line.startswith("-DOCSTART-"):
+            # New document marker (first-char check skips the prefix compare for token lines)
+            if line[:1] == '-' and line.startswith("-DOCSTART-"):
                 # Print previous document if exists
                 if current_doc and documents_shown < limit:
                     print_document(doc_id, current_doc)
@@ -45,20 +54,21 @@ def read_aida_tsv(file_path, limit=10):
                         return
                 
                 # Start new document
-                doc_id = line.split()[1] if len(line.split()) > 1 else f"Doc_{line_num}"
+                doc_parts = line.split()
+                doc_id = doc_parts[1] if len(doc_parts) > 1 else f"Doc_{line_num}"
                 current_doc = []
-                current_sentence = []
+                tokens, pos_tags, ne_tags, entities = [], [], [], []
                 continue
             
             # Empty line = end of sentence
             if not line:
-                if current_sentence:
-                    current_doc.append(current_sentence)
-                    current_sentence = []
+                if tokens:
+                    current_doc.append((tokens, pos_tags, ne_tags, entities))
+                    tokens, pos_tags, ne_tags, entities = [], [], [], []
                 continue
             
-            # Parse token line
-            parts = line.split('\t')
+            # Parse token line (only the first 4 fields are used, so don't split the rest)
+            parts = line.split('\t', 4)
             if len(parts) >= 4:
                 token, pos, ne_tag, entity = parts[0], parts[1], parts[2], parts[3]
             elif len(parts) >= 3:
@@ -67,12 +77,10 @@ def read_aida_tsv(file_path, limit=10):
             else:
                 continue
             
-            current_sentence.append({
-                'token': token,
-                'pos': pos,
-                'ne_tag': ne_tag,
-                'entity': entity
-            })
+            tokens.append(token)
+            pos_tags.append(pos)
+            ne_tags.append(ne_tag)
+            entities.append(entity)
     
     # Print last document
     if current_doc and documents_shown < limit:
@@ -83,48 +91,41 @@ def read_aida_tsv(file_path, limit=10):
 
 
 def print_document(doc_id, sentences):
-    """Print a document with entity highlighting"""
+    """Print a document with entity highlighting (sentences are column-list tuples)"""
     print(f"\n{'='*80}")
     print(f"📄 DOCUMENT: {doc_id}")
     print(f"{'='*80}")
     print(f"Number of sentences: {len(sentences)}\n")
     
-    for sent_idx, sentence in enumerate(sentences, 1):
+    for sent_idx, (tokens, _pos_tags, ne_tags, entities) in enumerate(sentences, 1):
         print(f"Sentence {sent_idx}:")
         print("-" * 80)
         
-        # Print the text
-        text_tokens = []
         entities_found = []
         current_entity = []
         current_entity_name = None
         
-        for token_data in sentence:
-            token = token_data['token']
-            ne_tag = token_data['ne_tag']
-            entity = token_data['entity']
-            
-            # Track entities
-            if ne_tag.startswith('B-'):  # Beginning of entity
+        for token, ne_tag, entity in zip(tokens, ne_tags, entities):
+            # Track entities by tag class, most common (Outside) first
+            tag_class = _BIO_CLASS.get(ne_tag[:2], BIO_OUTSIDE)
+            if tag_class == BIO_OUTSIDE:
                 if current_entity:
                     entities_found.append({
                         'text': ' '.join(current_entity),
                         'entity': current_entity_name
                     })
-                current_entity = [token]
-                current_entity_name = entity if entity != "--" else "Unknown"
-            elif ne_tag.startswith('I-'):  # Inside entity
-                current_entity.append(token)
-            else:  # Outside entity
+                    current_entity = []
+                    current_entity_name = None
+            elif tag_class == BIO_BEGIN:
                 if current_entity:
                     entities_found.append({
                         'text': ' '.join(current_entity),
                         'entity': current_entity_name
                     })
-                    current_entity = []
-                    current_entity_name = None
-            
-            text_tokens.append(token)
+                current_entity = [token]
+                current_entity_name = entity if entity != "--" else "Unknown"
+            else:  # Inside entity
+                current_entity.append(token)
         
         # Handle last entity
         if current_entity:
@@ -134,7 +135,7 @@ def print_document(doc_id, sentences):
             })
         
         # Print sentence text
-        sentence_text = ' '.join(text_tokens)
+        sentence_text = ' '.join(tokens)
         print(f"📝 Text: {sentence_text}")
         
         # Print entities
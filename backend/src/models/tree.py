@@ -4,6 +4,21 @@ import time
 from collections import deque
 from src.utils.debug_logger import get_debug_logger
 
+# Summarization instructions live in the system message so every call shares the same
+# prompt prefix (lets the provider's prompt cache hit); only the user message varies
+ROLLING_SUMMARY_SYSTEM_PROMPT = """You are maintaining a rolling summary of a conversation.
+
+You will be given the PREVIOUS SUMMARY and the NEW MESSAGES TO SUMMARIZE.
+Create an updated summary that:
+1. Preserves key information from the previous summary
+2. Adds important details from the new messages (topics, facts, decisions, preferences)
+3. Removes redundant information
+4. Stays concise (under {max_tokens} tokens)"""
+
+FIRST_SUMMARY_SYSTEM_PROMPT = """Summarize the conversation messages you are given concisely.
+Focus on: main topics, user information, key facts, important decisions.
+Keep under {max_tokens} tokens."""
+
 class LocalBuffer:
     """Fixed-size message buffer per conversation node with auto-archiving and rolling summarization."""
 
@@ -157,31 +172,21 @@ class LocalBuffer:
             for msg in all_buffer_messages
         ])
         
-        # Build prompt (updated to reflect ALL buffer messages)
+        # Build prompt (updated to reflect ALL buffer messages): static instructions first, variable text last
         if self.summary:
             # Rolling update: combine old summary + new buffer messages
-            prompt = f"""You are maintaining a rolling summary of a conversation.
-
-PREVIOUS SUMMARY (messages 1-{start_msg_num-1}):
+            system_prompt = ROLLING_SUMMARY_SYSTEM_PROMPT.format(max_tokens=self.summary_max_tokens)
+            prompt = f"""PREVIOUS SUMMARY (messages 1-{start_msg_num-1}):
 {self.summary}
 
 NEW MESSAGES TO SUMMARIZE (messages {start_msg_num}-{end_msg_num}, total: {len(all_buffer_messages)} messages):
 {conversation_text}
 
-Create an updated summary that:
-1. Preserves key information from the previous summary
-2. Adds important details from the new messages (topics, facts, decisions, preferences)
-3. Removes redundant information
-4. Stays concise (under {self.summary_max_tokens} tokens)
-
 Updated summary:"""
         else:
             # First summary - summarizing first full buffer
-            prompt = f"""Summarize the following conversation messages concisely.
-Focus on: main topics, user information, key facts, important decisions.
-Keep under {self.summary_max_tokens} tokens.
-
-MESSAGES (messages {start_msg_num}-{end_msg_num}, total: {len(all_buffer_messages)} messages):
+            system_prompt = FIRST_SUMMARY_SYSTEM_PROMPT.format(max_tokens=self.summary_max_tokens)
+            prompt = f"""MESSAGES (messages {start_msg_num}-{end_msg_num}, total: {len(all_buffer_messages)} messages):
 {conversation_text}
 
 Summary:"""
@@ -190,7 +195,10 @@ Summary:"""
             # Call LLM to generate summary
             response = self.llm_client.groq_client.chat.completions.create(
                 model="llama-3.3-70b-versatile",
-                messages=[{"role": "user", "content": prompt}],
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": prompt}
+                ],
                 max_tokens=500,
                 temperature=0.3  # Lower temperature for consistent summarization
             )
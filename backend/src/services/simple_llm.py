@@ -8,6 +8,13 @@ from ..cores.config import settings  # Use your existing config
 from .tools import ConversationTools
 from ..utils.debug_logger import get_debug_logger
 
+# Kept byte-for-byte stable across calls so title requests share a cacheable prompt prefix
+TITLE_SYSTEM_PROMPT = (
+    "You are a title generator. Generate a short, descriptive title (maximum 4 words) "
+    "for a conversation that starts with the user's question. "
+    "Respond only with the title, no quotes or extra formatting."
+)
+
 class SimpleLLMClient:
     """ Simple LLM client using Groq API with optional RAG """
 
@@ -743,13 +750,13 @@ The system can handle:
         # Try to use Groq API if client is available
         if self.groq_client:
             try:
-                # Create a focused prompt for title generation
-                title_prompt = f"Generate a short, descriptive title (maximum 4 words) for a conversation that starts with this question: '{question}'. Only respond with the title, no quotes or extra text."
+                # Fixed instructions in the system message (shared prompt prefix), only the question varies
+                title_prompt = f"Question: '{question}'\n\nTitle:"
                 
                 response = self.groq_client.chat.completions.create(
                     model=settings.model_base,
                     messages=[
-                        {"role": "system", "content": "You are a title generator. Generate short, descriptive titles for conversations. Respond only with the title, no quotes or extra formatting."},
+                        {"role": "system", "content": TITLE_SYSTEM_PROMPT},
                         {"role": "user", "content": title_prompt}
                     ],
                     max_tokens=50,  # Short response for titles